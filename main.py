@@ -4,6 +4,7 @@ import numpy as np
 from timeit import default_timer
 from src.utils import make_RGBA
 from src.world import World
+from src.simulation import SimulationRunner
 from src.camera import ConwaysGOLCamera, RayTracingCamera
 from src.objects import Sphere
 
@@ -25,13 +26,13 @@ screen = pygame.display.set_mode([WINDOW_WIDTH, WINDOW_HEIGHT])
 
 objects = [Sphere((0, 0, 4), radius=2)]
 world = World().add_objects(*objects)
-cameras = [RayTracingCamera(focal_length=1, viewport_width=2)]
+cameras = [RayTracingCamera(focal_length=1, viewport_width=2, antialias=True)]
 
 pixels = np.full([WINDOW_WIDTH, WINDOW_HEIGHT], make_RGBA(0, 0, 255, 255), dtype='uint32')
 
-# Handle time between updates
+# Simulate the world on its own thread at a fixed timestep, cameras draw from its latest state
 print_timings = True
-last_time = default_timer()
+runner = SimulationRunner(world, dt=1 / 120).start()
 
 running = True
 while running:
@@ -39,18 +40,13 @@ while running:
         if event.type == pygame.QUIT:
             running = False
     
-    time_inc = default_timer() - last_time
-    last_time = default_timer()
-    
-    # Update the universe
-    ut = default_timer()
-    world.update(time_inc)
-    if print_timings: print("Update time: %.4f" % (default_timer() - ut))
+    # Get the current state of the universe
+    state = runner.get_state()
 
     # Draw all of the cameras to the current pixels
     ut = default_timer()
     for camera in cameras:
-        camera.draw(pixels, world)
+        camera.draw(pixels, state)
     if print_timings: print("Draw time: %.4f" % (default_timer() - ut))
 
     # Put the current pixels on the screen
@@ -59,4 +55,5 @@ while running:
     pygame.display.update()
     if print_timings: print("Blit time: %.4f" % (default_timer() - ut))
 
+runner.stop()
 pygame.quit()
\ No newline at end of file
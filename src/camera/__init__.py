@@ -1,2 +1,3 @@
 from .gol_camera import ConwaysGOLCamera
-from .ray_tracing_camera import RayTracingCamera
\ No newline at end of file
+from .ray_tracing_camera import RayTracingCamera
+from .environment_map import EnvironmentMap
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Background image for rays that don't hit anything"""
+import os
+import hashlib
+import numpy as np
+
+
+# Bump this whenever the way mip pyramids are built changes, so old cached pyramids aren't used
+_CACHE_VERSION = 1
+
+# Cube map faces, in the order they should be given: +x, -x, +y, -y, +z, -z
+CUBE_FACES = ['+x', '-x', '+y', '-y', '+z', '-z']
+
+
+class EnvironmentMap:
+    """An image surrounding the entire world (a starfield, sky, etc.), sampled by ray direction
+
+    The image is loaded once and turned into a mip pyramid (each level is half the size of the last, averaging 2x2
+    blocks of texels). Rays are sampled all at once, choosing the mip level by how much of the sky each ray covers, so
+    far-apart rays read from small levels instead of jumping around a huge texture. The pyramid is stored as uint8 to
+    keep memory traffic down, and cached to disk as .npy files so later startups can just memory-map it.
+
+    Directions use the camera's coordinates: +x is right, +y is up, +z is forward.
+
+    Parameters
+    ----------
+    image: `Union[str, array, list]`
+        For kind='equirectangular', a path to an image or an (H, W, 3) array. For kind='cube', a list of 6 paths or
+        square (S, S, 3) arrays, in the order of CUBE_FACES
+    kind: `str`
+        Either 'equirectangular' or 'cube'
+    cache_dir: `Optional[str]`
+        Directory to cache mip pyramids in. Only images loaded from paths are cached. Set to None to disable caching
+    """
+    def __init__(self, image, kind: str = 'equirectangular', cache_dir: str = '.env_map_cache'):
+        self.kind = kind.lower().replace('_', '').replace('-', '')
+        if self.kind not in ['equirectangular', 'cube']:
+            raise ValueError("Unknown environment map kind: %s" % repr(kind))
+
+        images = image if self.kind == 'cube' else [image]
+        if self.kind == 'cube' and (not isinstance(images, (list, tuple)) or len(images) != 6):
+            raise ValueError("Cube environment maps need a list of 6 images, in order: %s" % CUBE_FACES)
+
+        cache_path = None
+        if cache_dir is not None and all(isinstance(im, str) for im in images):
+            cache_path = os.path.join(cache_dir, _cache_key(images, self.kind))
+
+        self.levels = _load_cached_pyramid(cache_path) if cache_path is not None else None
+        if self.levels is None:
+            base = np.stack([_load_image(im) for im in images])
+            if self.kind == 'cube' and base.shape[1] != base.shape[2]:
+                raise ValueError("Cube map faces must be square, got shape: %s" % (base.shape[1:3],))
+
+            self.levels = _build_pyramid(base)
+            if cache_path is not None:
+                _save_cached_pyramid(cache_path, self.levels)
+
+        # Angle (in radians) covered by one texel of the full size image
+        self.texel_angle = np.pi / self.levels[0].shape[1] if self.kind == 'equirectangular' else (np.pi / 2) / self.levels[0].shape[1]
+
+    def sample(self, directions, footprints=None):
+        """Samples the environment map in the given directions
+
+        Args:
+            directions (array): (N, 3) ray directions, need not be normalized
+            footprints (Optional[array]): (N,) angle (in radians) covered by each ray, used to pick the mip level. If
+                None, the full size image is always used
+
+        Returns:
+            np.ndarray: (N, 3) float32 RGB colors in [0, 255]
+        """
+        directions = np.asarray(directions, dtype='float64')
+        if footprints is None:
+            level = np.zeros((len(directions),))
+        else:
+            level = np.clip(np.log2(np.maximum(np.asarray(footprints) / self.texel_angle, 1)), 0, len(self.levels) - 1)
+
+        # Trilinear filtering: blend between the two nearest levels. Rays are grouped by level so each lookup works
+        #   on one contiguous array
+        lower = np.floor(level).astype('int32')
+        frac = (level - lower)[:, None].astype('float32')
+        ret = np.empty((len(directions), 3), dtype='float32')
+
+        for lvl in np.unique(lower):
+            idx = np.flatnonzero(lower == lvl)
+            colors = self._sample_level(lvl, directions[idx])
+
+            # Only read the next level for rays that actually blend with it. Rays whose footprint is a texel or less
+            #   (and all rays when footprints is None) have no blend, so they cost a single lookup
+            blending = np.flatnonzero(frac[idx, 0] > 0) if lvl + 1 < len(self.levels) else []
+            if len(blending) == len(idx):
+                blend = frac[idx]
+                colors = colors * (1 - blend) + self._sample_level(lvl + 1, directions[idx]) * blend
+            elif len(blending) > 0:
+                blend, upper = frac[idx[blending]], self._sample_level(lvl + 1, directions[idx[blending]])
+                colors[blending] = colors[blending] * (1 - blend) + upper * blend
+            ret[idx] = colors
+
+        return ret
+
+    def _sample_level(self, lvl, directions):
+        """Bilinearly samples the given mip level"""
+        faces, rows, cols = self._texel_coords(lvl, directions)
+        level = self.levels[lvl]
+        n_faces, height, width = level.shape[:3]
+        flat = level.reshape(n_faces * height * width, 3)
+
+        # Texel centers are at +0.5, so shift back to find the top-left texel of our 2x2 neighborhood
+        rows, cols = rows - 0.5, cols - 0.5
+        r0, c0 = np.floor(rows).astype('int64'), np.floor(cols).astype('int64')
+        fr, fc = (rows - r0)[:, None].astype('float32'), (cols - c0)[:, None].astype('float32')
+
+        # Equirectangular images wrap around horizontally, everything else is clamped at the edges
+        if self.kind == 'equirectangular':
+            ca, cb = c0 % width, (c0 + 1) % width
+        else:
+            ca, cb = np.clip(c0, 0, width - 1), np.clip(c0 + 1, 0, width - 1)
+        ra, rb = np.clip(r0, 0, height - 1), np.clip(r0 + 1, 0, height - 1)
+
+        base = faces.astype('int64') * (height * width)
+        top = np.take(flat, base + ra * width + ca, axis=0) * (1 - fc) + np.take(flat, base + ra * width + cb, axis=0) * fc
+        bottom = np.take(flat, base + rb * width + ca, axis=0) * (1 - fc) + np.take(flat, base + rb * width + cb, axis=0) * fc
+        return top * (1 - fr) + bottom * fr
+
+    def _texel_coords(self, lvl, directions):
+        """Converts directions into (face, row, col) texel coordinates on the given mip level"""
+        height, width = self.levels[lvl].shape[1:3]
+        x, y, z = directions[:, 0], directions[:, 1], directions[:, 2]
+
+        if self.kind == 'equirectangular':
+            u = 0.5 + np.arctan2(x, z) / (2 * np.pi)
+            v = 0.5 - np.arcsin(np.clip(y / np.linalg.norm(directions, axis=1), -1, 1)) / np.pi
+            return np.zeros((len(directions),), dtype='int32'), v * height, u * width
+
+        # Pick the face by the axis with the largest magnitude, then project onto that face
+        ax, ay, az = np.abs(x), np.abs(y), np.abs(z)
+        major = np.argmax(np.stack([ax, ay, az], axis=1), axis=1)
+        faces = np.where(major == 0, np.where(x > 0, 0, 1), np.where(major == 1, np.where(y > 0, 2, 3), np.where(z > 0, 4, 5)))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.select([faces == 0, faces == 1, faces == 2, faces == 3, faces == 4], [-z / ax, z / ax, x / ay, x / ay, x / az], -x / az)
+            v = np.select([faces == 0, faces == 1, faces == 2, faces == 3, faces == 4], [-y / ax, -y / ax, z / ay, -z / ay, -y / az], -y / az)
+
+        return faces, (v + 1) / 2 * height, (u + 1) / 2 * width
+
+
+def _load_image(image):
+    """Loads an image path (or array) into an (H, W, 3) float32 array"""
+    if not isinstance(image, str):
+        arr = np.asarray(image, dtype='float32')
+        if arr.ndim != 3 or arr.shape[2] != 3:
+            raise ValueError("Environment map images must have shape (H, W, 3), got: %s" % (arr.shape,))
+        return arr
+
+    try:
+        import pygame
+    except ImportError:
+        raise ImportError("Could not import necessary library 'pygame' for loading environment map images")
+
+    # pygame gives (width, height, 3) arrays, so transpose into (rows, cols, 3)
+    return pygame.surfarray.array3d(pygame.image.load(image)).transpose(1, 0, 2).astype('float32')
+
+
+def _build_pyramid(base):
+    """Builds the list of mip levels, each (n_faces, H, W, 3) uint8, by averaging 2x2 blocks until one side hits 1"""
+    levels = [base]
+    while min(levels[-1].shape[1:3]) > 1:
+        prev = levels[-1]
+        h, w = prev.shape[1] // 2, prev.shape[2] // 2
+        levels.append(prev[:, :2 * h, :2 * w].reshape(prev.shape[0], h, 2, w, 2, 3).mean(axis=(2, 4)))
+    return [np.ascontiguousarray(np.clip(np.round(lvl), 0, 255).astype('uint8')) for lvl in levels]
+
+
+def _cache_key(paths, kind):
+    """Key for a cached pyramid, which changes whenever any of the images change"""
+    key = hashlib.sha1(('%d:%s' % (_CACHE_VERSION, kind)).encode())
+    for path in paths:
+        stat = os.stat(path)
+        key.update(('|%s:%d:%d' % (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)).encode())
+    return key.hexdigest()
+
+
+def _load_cached_pyramid(cache_path):
+    """Memory-maps a cached pyramid, returning None if it hasn't been cached"""
+    levels = []
+    while os.path.exists('%s_level%d.npy' % (cache_path, len(levels))):
+        levels.append(np.load('%s_level%d.npy' % (cache_path, len(levels)), mmap_mode='r'))
+    return levels if len(levels) > 0 and min(levels[-1].shape[1:3]) == 1 else None
+
+
+def _save_cached_pyramid(cache_path, levels):
+    """Saves a pyramid to the cache. Each file is written then renamed, so other processes never see half a file"""
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    for i, level in enumerate(levels):
+        tmp_path = '%s_level%d.%d.tmp.npy' % (cache_path, i, os.getpid())
+        np.save(tmp_path, level)
+        os.replace(tmp_path, '%s_level%d.npy' % (cache_path, i))
\ No newline at end of file
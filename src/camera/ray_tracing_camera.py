@@ -1,12 +1,17 @@
 """Camera class to be placed in a world"""
+import numpy as np
 from ..utils import check_type, make_RGBA
 from .. import arrays as ar
+from .environment_map import EnvironmentMap
 from ..world import World
 
 
 # Dtype for numpy ray tracing
 _NP_RT_DTYPE = 'float32'
 
+# Maximum number of ray/primitive pairs to intersect at once when culling, to keep memory bounded
+_MAX_CULL_PAIRS = 2 ** 21
+
 
 class RayTracingCamera:
     """Camera that performs ray tracing
@@ -14,7 +19,7 @@ class RayTracingCamera:
     This camera is immovable, always located at (0, 0, 0), with the center of the viewport being located at (0, 0, focal_length).
 
     If you wish to move the camera, you can instead rotate the entire world around it. Very self-centered, this camera is
-    
+
     Parameters
     ----------
     focal_length: `float`
@@ -23,12 +28,42 @@ class RayTracingCamera:
         The width of the viewport in world size. The height will fit the aspect ratio of the screen during draw() calls
     array_package: `str`
         The array package to use
+    environment_map: `Optional[EnvironmentMap]`
+        Background that rays which don't hit anything are colored by. If None, the background is black
+    antialias: `bool`
+        If True, pixels along the edges of objects (where neighboring pixels hit different objects or primitives, or
+        hit at very different depths) are re-traced with several subsamples each and averaged. Other pixels keep their single ray
+    aa_grid_size: `int`
+        Edge pixels are split into an `aa_grid_size` x `aa_grid_size` grid, with one jittered subsample in each cell
+    aa_max_samples: `int`
+        The maximum number of extra subsamples to trace per frame. If there are more edge pixels than this allows,
+        only those with the most contrast are antialiased
+    aa_depth_threshold: `float`
+        Neighboring pixels hitting the same primitive of the same object are considered an edge if their depths differ by more than this
+        fraction of the nearer depth
     """
-    def __init__(self, focal_length: float = 1.0, viewport_width: float = 2.0, array_package: str = 'numpy'):
-        
+    def __init__(self, focal_length: float = 1.0, viewport_width: float = 2.0, array_package: str = 'numpy',
+                 environment_map: EnvironmentMap = None, antialias: bool = False, aa_grid_size: int = 2,
+                 aa_max_samples: int = 200_000, aa_depth_threshold: float = 0.05):
+
         self.focal_length = check_type(focal_length, 'float-positive', varname='focal_length')
         self.viewport_width = check_type(viewport_width, 'float-positive', varname='viewport_width')
 
+        if environment_map is not None and not isinstance(environment_map, EnvironmentMap):
+            raise TypeError("`environment_map` must be an EnvironmentMap, got: %s" % repr(type(environment_map).__name__))
+        self.environment_map = environment_map
+
+        self.antialias = antialias
+        self.aa_grid_size = int(check_type(aa_grid_size, 'int-positive', varname='aa_grid_size'))
+        self.aa_max_samples = int(check_type(aa_max_samples, 'int-non-negative', varname='aa_max_samples'))
+        self.aa_depth_threshold = check_type(aa_depth_threshold, 'float-non-negative', varname='aa_depth_threshold')
+
+        # Stratified subsample offsets within a pixel: one point per grid cell, jittered within its cell. These are
+        #   fixed when the camera is made so that edges don't shimmer from one frame to the next
+        cells = (np.arange(self.aa_grid_size) + 0.5) / self.aa_grid_size
+        jitter = (np.random.default_rng(0).random((self.aa_grid_size ** 2, 2)) - 0.5) / self.aa_grid_size
+        self._aa_offsets = np.stack(np.meshgrid(cells, cells, indexing='ij'), axis=-1).reshape(-1, 2) + jitter
+
         with ar.array_package_context(array_package):
             self.array_package = ar.get_array_package_string()
 
@@ -41,35 +76,220 @@ class RayTracingCamera:
 
     @ar.array_package_decorator('numpy')
     def _draw_numpy(self, screen, world: World):
-        """Super slow numpy/python version of ray tracing"""
-        # Find the viewport height, same aspect ratio as screen, using our self.viewport_width
-        viewport_height = ar.shape(screen, 0) * self.viewport_width / ar.shape(screen, 1)
+        """Numpy version of ray tracing, tracing all of the pixels at once"""
+        n_rows, n_cols = ar.shape(screen, 0), ar.shape(screen, 1)
+
+        # One ray through the center of each pixel
+        rows, cols = np.meshgrid(np.arange(n_rows) + 0.5, np.arange(n_cols) + 0.5, indexing='ij')
+        depth, hit_ids, hit_prims, ray_ends = self._trace(n_rows, n_cols, rows.ravel(), cols.ravel(), world)
+        colors = self._shade(depth, ray_ends, self.viewport_width / n_cols).reshape(n_rows, n_cols, 3)
+        depth, hit_ids, hit_prims = (arr.reshape(n_rows, n_cols) for arr in (depth, hit_ids, hit_prims))
+
+        if self.antialias:
+            self._antialias(colors, depth, hit_ids, hit_prims, world)
+
+        screen[:, :] = self._pack_colors(colors)
+
+    def _ray_ends(self, n_rows, n_cols, rows, cols):
+        """Computes the endpoints of rays through the given (fractional) pixel coordinates on the viewport
+
+        Ray starts are always (0, 0, 0). Pixel (r, c) covers coordinates [r, r + 1) x [c, c + 1), so the center of the
+        pixel is at (r + 0.5, c + 0.5). We also have to flip the rows around, otherwise the camera will be upside down
+        """
+        # The side length of a virtual 'pixel' on the viewport in space, and the viewport height (same aspect ratio as
+        #   the screen, using our self.viewport_width)
+        viewport_pix_len = self.viewport_width / n_cols
+        viewport_height = n_rows * self.viewport_width / n_cols
+
+        ray_ends = np.empty((len(rows), 3), dtype=_NP_RT_DTYPE)
+        ray_ends[:, 0] = -self.viewport_width / 2 + cols * viewport_pix_len
+        ray_ends[:, 1] = -viewport_height / 2 + (n_rows + 1 - rows) * viewport_pix_len
+        ray_ends[:, 2] = self.focal_length
+        return ray_ends
+
+    def _trace(self, n_rows, n_cols, rows, cols, world: World):
+        """Finds the closest collision of each ray (through the given fractional pixel coordinates) with any object
+
+        Objects that can give their projected_bounds() are only intersected with the rays inside those bounds, see
+        _trace_culled(). Everything else is intersected with every ray, and done first so culled objects can skip
+        anything behind them
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: the distance to the closest collision (inf if nothing 
+                is hit), the index of the object in world.objects that was hit (-1 if nothing is hit), the index of the 
+                primitive within that object that was hit (always 0 for objects without projected_bounds()), and the 
+                ray endpoints
+        """
+        ray_ends = self._ray_ends(n_rows, n_cols, rows, cols)
+        ray_start = np.zeros((3,), dtype=_NP_RT_DTYPE)
+        depth = np.full((len(ray_ends),), np.inf)
+        hit_ids = np.full((len(ray_ends),), -1, dtype='int32')
+        hit_prims = np.zeros((len(ray_ends),), dtype='int64')
+
+        culled = []
+        for i, obj in enumerate(world.objects):
+            bounds = obj.projected_bounds(self.focal_length)
+            if bounds is not None:
+                culled.append((i, obj, bounds))
+                continue
+
+            dists = obj.distances(ray_start, ray_ends)
+            closer = (dists >= 0) & (dists < depth)
+            depth[closer] = dists[closer]
+            hit_ids[closer] = i
+            hit_prims[closer] = 0
+
+        if len(culled) > 0:
+            # Group the rays by which pixel they're in, so we can find all of the rays inside some screen bounds
+            pixel_ids = (np.clip(np.floor(rows), 0, n_rows - 1) * n_cols + np.clip(np.floor(cols), 0, n_cols - 1)).astype('int64')
+            ray_order = np.argsort(pixel_ids, kind='stable')
+            pixel_starts = np.searchsorted(pixel_ids[ray_order], np.arange(n_rows * n_cols + 1))
+
+            for i, obj, (bounds, near) in culled:
+                self._trace_culled(i, obj, bounds, near, n_rows, n_cols, ray_order, pixel_starts, ray_start, ray_ends,
+                                   depth, hit_ids, hit_prims)
+
+        return depth, hit_ids, hit_prims, ray_ends
+
+    def _trace_culled(self, obj_id, obj, bounds, near, n_rows, n_cols, ray_order, pixel_starts, ray_start, ray_ends,
+                      depth, hit_ids, hit_prims):
+        """Intersects each primitive of an object only with the rays in pixels its projected bounds touch
 
-        # The side length of a virtual 'pixel' on the viewport in space
-        viewport_pix_len = self.viewport_width / ar.shape(screen, 1)
+        Primitives are done nearest first, and pairs are skipped if the ray has already hit something closer than the
+        primitive could possibly be, so the work is about the screen area the primitives cover rather than
+        pixels * primitives. Updates `depth`, `hit_ids` and `hit_prims` inplace
+        """
+        viewport_pix_len = self.viewport_width / n_cols
+        viewport_height = n_rows * self.viewport_width / n_cols
 
-        # The starting point of our ray, always (0, 0, 0)
-        ray_start = ar.array([0, 0, 0], dtype=_NP_RT_DTYPE)
+        # Convert the bounds into inclusive ranges of pixels (the inverse of _ray_ends()), padded a tiny bit to be safe
+        #   against rounding. Clip before converting to ints, since bounds can be infinite
+        pad = 1e-3
+        col_lo = np.floor(np.clip((bounds[:, 0] + self.viewport_width / 2) / viewport_pix_len - pad, 0, n_cols)).astype('int64')
+        col_hi = np.floor(np.clip((bounds[:, 1] + self.viewport_width / 2) / viewport_pix_len + pad, -1, n_cols - 1)).astype('int64')
+        row_lo = np.floor(np.clip(n_rows + 1 - (bounds[:, 3] + viewport_height / 2) / viewport_pix_len - pad, 0, n_rows)).astype('int64')
+        row_hi = np.floor(np.clip(n_rows + 1 - (bounds[:, 2] + viewport_height / 2) / viewport_pix_len + pad, -1, n_rows - 1)).astype('int64')
 
+        widths, heights = np.maximum(col_hi - col_lo + 1, 0), np.maximum(row_hi - row_lo + 1, 0)
+        areas = widths * heights
+
+        # Nearest primitives first, dropping any that are entirely off screen
+        order = np.argsort(near, kind='stable')
+        order = order[areas[order] > 0]
+        cum_areas = np.cumsum(areas[order])
+
+        start = 0
+        while start < len(order):
+            # Take as many primitives as fit in our limit on pairs (but always at least one)
+            prev_area = cum_areas[start - 1] if start > 0 else 0
+            end = max(start + 1, int(np.searchsorted(cum_areas, prev_area + _MAX_CULL_PAIRS, side='right')))
+            prims = order[start:end]
+            start = end
+
+            # Every pixel inside the bounds of each primitive
+            owners, k = _expand_ranges(np.zeros(len(prims), dtype='int64'), areas[prims])
+            prim_ids = prims[owners]
+            pixels = (row_lo[prim_ids] + k // widths[prim_ids]) * n_cols + col_lo[prim_ids] + k % widths[prim_ids]
+
+            # Every ray inside each of those pixels
+            owners, ray_idx = _expand_ranges(pixel_starts[pixels], pixel_starts[pixels + 1] - pixel_starts[pixels])
+            prim_ids, ray_idx = prim_ids[owners], ray_order[ray_idx]
+
+            # Early depth test, skipping rays that have already hit something in front of the primitive
+            keep = depth[ray_idx] > near[prim_ids]
+            prim_ids, ray_idx = prim_ids[keep], ray_idx[keep]
+            if len(ray_idx) == 0:
+                continue
+
+            dists = obj.primitive_distances(ray_start, ray_ends[ray_idx], prim_ids)
+            closer = (dists >= 0) & (dists < depth[ray_idx])
+            ray_idx, dists, prim_ids = ray_idx[closer], dists[closer], prim_ids[closer]
+
+            # A ray can be in several pairs, keep only the closest hit for each
+            pair_order = np.lexsort((dists, ray_idx))
+            ray_idx, dists, prim_ids = ray_idx[pair_order], dists[pair_order], prim_ids[pair_order]
+            first = np.ones((len(ray_idx),), dtype=bool)
+            first[1:] = ray_idx[1:] != ray_idx[:-1]
+            depth[ray_idx[first]] = dists[first]
+            hit_ids[ray_idx[first]] = obj_id
+            hit_prims[ray_idx[first]] = prim_ids[first]
+
+    def _shade(self, depth, ray_ends, sample_len):
+        """Converts the results of _trace() into (N, 3) float RGB colors in [0, 255]
+
+        If we have collided with anything, set its color in black/white based on distance. Otherwise, use the
+        environment map (or black if we don't have one)
+
+        Args:
+            depth (np.ndarray): (N,) distances from _trace()
+            ray_ends (np.ndarray): (N, 3) ray endpoints that were traced
+            sample_len (float): the side length on the viewport that each ray covers, used to filter the environment map
+        """
         # Maximum distance before reaching edge of the universe (used for selecting color right now)
         max_distance = 10.0
 
-        # Go through each pixel in the screen
-        for row_i in range(ar.shape(screen, 0)):
-            for col_i in range(ar.shape(screen, 1)):
-
-                # Compute our ray endpoint. Start is (0, 0, 0), end is the center of the virtual 'pixel' on 
-                #   the viewport in space
-                # We add 0.5 to the row/column inds to shift into center of pixel
-                # We also have to flip the rows around, otherwise the camera will be upside down
-                ray_end = ar.array([-self.viewport_width / 2 + (col_i + 0.5) * viewport_pix_len, 
-                                    -viewport_height / 2 + ((ar.shape(screen, 0) - row_i) + 0.5) * viewport_pix_len,
-                                    self.focal_length], dtype=_NP_RT_DTYPE)
-                
-                # Go through each object in the world and find its collision with our ray
-                collisions = [v for v in [obj.distance(ray_start, ray_end) for obj in world.objects] if v >= 0]
-                cv = (255 - int(255 * min(collisions) / max_distance)) if len(collisions) > 0 else None
-
-                # If we have collided with anything, set its color in black/white based on distance
-                # Otherwise, set color to black
-                screen[row_i, col_i] = make_RGBA(cv, cv, cv, 255) if cv is not None else make_RGBA(0, 0, 0, 255)
+        hit = np.isfinite(depth)
+        cv = np.where(hit, np.clip(255 - 255 * depth / max_distance, 0, 255), 0)
+        colors = np.repeat(cv[:, None], 3, axis=1)
+
+        if self.environment_map is not None and not hit.all():
+            # A square of side sample_len on the viewport covers about sample_len * cos(angle) / distance radians
+            missed = ray_ends[~hit].astype('float64')
+            footprints = sample_len * self.focal_length / np.einsum('ij,ij->i', missed, missed)
+            colors[~hit] = self.environment_map.sample(missed, footprints)
+
+        return colors
+
+    def _antialias(self, colors, depth, hit_ids, hit_prims, world: World):
+        """Re-traces edge pixels with stratified subsamples, averaging them into `colors` inplace"""
+        n_rows, n_cols = ar.shape(depth, 0), ar.shape(depth, 1)
+        n_subsamples = len(self._aa_offsets)
+        max_pixels = self.aa_max_samples // n_subsamples
+        if max_pixels == 0:
+            return
+
+        # Compare each pixel with its neighbors below and to the right, marking both pixels of any pair that differ
+        edges = np.zeros((n_rows, n_cols), dtype=bool)
+        contrast = np.zeros((n_rows, n_cols))
+        finite_depth = np.where(np.isfinite(depth), depth, 0)
+        grey = colors.mean(axis=-1)
+        for a, b in [((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+                     ((slice(None), slice(None, -1)), (slice(None), slice(1, None)))]:
+            # Different objects, or different primitives (eg: spheres) of the same object, always make an edge
+            differs = (hit_ids[a] != hit_ids[b]) | (hit_prims[a] != hit_prims[b])
+            differs |= np.abs(finite_depth[a] - finite_depth[b]) > \
+                self.aa_depth_threshold * np.minimum(finite_depth[a], finite_depth[b])
+            diff = np.where(differs, np.abs(grey[a] - grey[b]), 0)
+            edges[a] |= differs
+            edges[b] |= differs
+            np.maximum(contrast[a], diff, out=contrast[a])
+            np.maximum(contrast[b], diff, out=contrast[b])
+
+        edge_pixels = np.flatnonzero(edges)
+        if len(edge_pixels) == 0:
+            return
+
+        # Keep our extra work bounded, only doing the highest contrast edges if there are too many
+        if len(edge_pixels) > max_pixels:
+            edge_pixels = edge_pixels[np.argpartition(contrast.ravel()[edge_pixels], -max_pixels)[-max_pixels:]]
+
+        # Trace all of the subsamples for all of the edge pixels in one batch
+        rows = (edge_pixels // n_cols)[:, None] + self._aa_offsets[None, :, 0]
+        cols = (edge_pixels % n_cols)[:, None] + self._aa_offsets[None, :, 1]
+        sub_depth, _, _, sub_ray_ends = self._trace(n_rows, n_cols, rows.ravel(), cols.ravel(), world)
+
+        sub_len = self.viewport_width / n_cols / self.aa_grid_size
+        sub_colors = self._shade(sub_depth, sub_ray_ends, sub_len).reshape(len(edge_pixels), n_subsamples, 3)
+        colors.reshape(-1, 3)[edge_pixels] = sub_colors.mean(axis=1)
+
+    def _pack_colors(self, colors):
+        """Converts (..., 3) float RGB colors in [0, 255] into RGBA unsigned ints"""
+        rgb = np.round(colors).astype('uint32')
+        return make_RGBA(rgb[..., 0], rgb[..., 1], rgb[..., 2], 255)
+
+
+def _expand_ranges(starts, lengths):
+    """For each i, gives all of the values starts[i], ..., starts[i] + lengths[i] - 1, along with the i they came from"""
+    owners = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(len(owners)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owners, starts[owners] + offsets
\ No newline at end of file
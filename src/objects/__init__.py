@@ -1,2 +1,3 @@
 from .world_object import WorldObject
-from .sphere import Sphere
\ No newline at end of file
+from .sphere import Sphere
+from .sphere_collection import SphereCollection
\ No newline at end of file
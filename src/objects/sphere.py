@@ -1,9 +1,82 @@
 import math
+import numpy as np
 from .world_object import WorldObject
 from ..utils import check_type
 from .. import arrays as ar
 
 
+def ray_sphere_distances(ray_start, ray_ends, centers, radii, pairwise: bool = False):
+    """Vectorized version of `Sphere.distance()` between many rays and many spheres
+    
+    Args:
+        ray_start (array): (3,) start point shared by every ray
+        ray_ends (array): (N, 3) end point of each ray
+        centers (array): (M, 3) center of each sphere
+        radii (array): (M,) radius of each sphere
+        pairwise (bool): if True, M must equal N, and only ray i and sphere i are checked against each other
+    
+    Returns:
+        np.ndarray: (N, M) array (or (N,) if pairwise) with the closer of the two solutions for each ray/sphere pair, 
+            or -1 if it misses
+    """
+    ray_directions = np.asarray(ray_ends, dtype='float64') - ray_start
+    ray_sphere_offsets = np.asarray(centers, dtype='float64') - ray_start
+    radii = np.asarray(radii, dtype='float64')
+
+    a = np.einsum('ij,ij->i', ray_directions, ray_directions)
+    c = np.einsum('ij,ij->i', ray_sphere_offsets, ray_sphere_offsets) - radii ** 2
+    if pairwise:
+        b = -2 * np.einsum('ij,ij->i', ray_directions, ray_sphere_offsets)
+    else:
+        a, b, c = a[:, None], -2 * (ray_directions @ ray_sphere_offsets.T), c[None, :]
+
+    under_sqrt = b ** 2 - 4 * a * c
+    hit = under_sqrt >= 0
+    return np.where(hit, (-b - np.sqrt(np.where(hit, under_sqrt, 0))) / (2 * a), -1.0)
+
+
+def sphere_projected_bounds(centers, radii, focal_length):
+    """Bounds of where spheres show up on the viewport of a camera at the origin looking down +z (see `RayTracingCamera`)
+    
+    Each sphere projects to an ellipse on the viewport plane z=focal_length. Its left/right edges come from the two 
+    planes x = k*z that are tangent to the sphere, which have distance |cx - k*cz| / sqrt(1 + k^2) = r from the center, 
+    giving:
+
+        k = (cx*cz +- r*sqrt(cx^2 + cz^2 - r^2)) / (cz^2 - r^2)
+    
+    and the same for the top/bottom edges with cy. This only works for spheres fully in front of the camera (cz > r). 
+    Spheres fully behind the camera can never be hit and get empty bounds, and spheres crossing the plane of the camera 
+    get infinite bounds.
+
+    Args:
+        centers (array): (M, 3) center of each sphere
+        radii (array): (M,) radius of each sphere
+        focal_length (float): distance from the camera to the viewport
+    
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (M, 4) array of [x_min, x_max, y_min, y_max] on the viewport for each sphere, and 
+            (M,) array with the smallest distance (as returned by distance()) that each sphere could be hit at
+    """
+    centers, radii = np.asarray(centers, dtype='float64'), np.asarray(radii, dtype='float64')
+    cx, cy, cz = centers[:, 0], centers[:, 1], centers[:, 2]
+
+    in_front = cz > radii
+    denom = np.where(in_front, cz ** 2 - radii ** 2, 1)
+    bounds = np.empty((len(radii), 4))
+    for i, c in enumerate([cx, cy]):
+        root = radii * np.sqrt(np.where(in_front, c ** 2 + cz ** 2 - radii ** 2, 0))
+        bounds[:, 2 * i] = focal_length * (c * cz - root) / denom
+        bounds[:, 2 * i + 1] = focal_length * (c * cz + root) / denom
+    
+    behind = cz + radii <= 0
+    bounds[~in_front] = [-np.inf, np.inf, -np.inf, np.inf]
+    bounds[behind] = [np.inf, -np.inf, np.inf, -np.inf]
+
+    # Rays end at z=focal_length, so a hit at distance t is at z = t * focal_length
+    near = np.maximum(cz - radii, 0) / focal_length
+    return bounds, near
+
+
 class Sphere(WorldObject):
     """A solid sphere
     
@@ -13,14 +86,21 @@ class Sphere(WorldObject):
         Position of this sphere in space
     radius: `float`
         radius of this sphere
+    velocity: `tuple[float, float, float]`
+        Velocity of this sphere, in world units per second
+    material_id: `int`
+        Id of the material this sphere is made of
     """
 
-    def __init__(self, position: tuple[float, float, float], radius: float = 1.0):
+    def __init__(self, position: tuple[float, float, float], radius: float = 1.0, 
+                 velocity: tuple[float, float, float] = (0.0, 0.0, 0.0), material_id: int = 0):
         self.position = check_type(position, 'point', 'position')
         self.radius = check_type(radius, 'float-positive', 'radius')
+        self.velocity = check_type(velocity, 'point', 'velocity')
+        self.material_id = int(check_type(material_id, 'int-non-negative', 'material_id'))
     
     def update(self, world, delta):
-        return super().update(world, delta)
+        self.position = tuple(p + v * delta for p, v in zip(self.position, self.velocity))
     
     def distance(self, ray_start, ray_end):
         """See chapter 5 in https://raytracing.github.io/books/RayTracingInOneWeekend.html for derivation
@@ -52,3 +132,12 @@ class Sphere(WorldObject):
         v1 = (-b + math.sqrt(under_sqrt)) / (2*a)
         v2 = (-b - math.sqrt(under_sqrt)) / (2*a)
         return min(v1, v2)
+    
+    def distances(self, ray_start, ray_ends):
+        return ray_sphere_distances(ray_start, ray_ends, [self.position], [self.radius])[:, 0]
+    
+    def projected_bounds(self, focal_length):
+        return sphere_projected_bounds([self.position], [self.radius], focal_length)
+    
+    def primitive_distances(self, ray_start, ray_ends, primitive_ids):
+        return self.distances(ray_start, ray_ends)
\ No newline at end of file
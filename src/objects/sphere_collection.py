@@ -0,0 +1,104 @@
+import copy
+import numpy as np
+from typing_extensions import Self
+from .world_object import WorldObject
+from .sphere import ray_sphere_distances, sphere_projected_bounds
+from ..utils import check_array_type
+
+
+class SphereCollection(WorldObject):
+    """Many solid spheres stored together as columns of arrays
+
+    This is much faster than adding each `Sphere` to the world separately when there are lots of them, and the arrays
+    can be memory-mapped straight from a scene file (see `src.scene_file`). The arrays are never modified inplace, so
+    memory-mapped columns can be shared between processes.
+
+    Parameters
+    ----------
+    centers: `array`
+        (N, 3) array of the center of each sphere
+    radii: `array`
+        (N,) array of the radius of each sphere
+    velocities: `Optional[array]`
+        (N, 3) array of the velocity of each sphere, in world units per second. Defaults to all zeros
+    material_ids: `Optional[array]`
+        (N,) array of the material id of each sphere. Defaults to all zeros
+    validate: `bool`
+        If True, check that all of the arrays have good shapes and values
+    """
+
+    def __init__(self, centers, radii, velocities=None, material_ids=None, validate: bool = True):
+        n = len(radii)
+        velocities = np.zeros((n, 3), dtype='float64') if velocities is None else velocities
+        material_ids = np.zeros((n,), dtype='int32') if material_ids is None else material_ids
+
+        if validate:
+            centers = check_array_type(centers, 'float', 'centers', width=3)
+            radii = check_array_type(radii, 'float-positive', 'radii')
+            velocities = check_array_type(velocities, 'float', 'velocities', width=3)
+            material_ids = check_array_type(material_ids, 'int-non-negative', 'material_ids')
+
+            if not (len(centers) == len(radii) == len(velocities) == len(material_ids)):
+                raise ValueError("All sphere columns must have the same length, got: %s" %
+                                 [len(centers), len(radii), len(velocities), len(material_ids)])
+
+        self.centers = centers
+        self.radii = radii
+        self.velocities = velocities
+        self.material_ids = material_ids
+
+        # Skip updating entirely if nothing can move
+        self._moving = bool(np.any(velocities != 0))
+
+    def __len__(self):
+        return len(self.radii)
+
+    @property
+    def position(self):
+        """The mean center of all of the spheres"""
+        return tuple(np.mean(self.centers, axis=0)) if len(self) > 0 else (0.0, 0.0, 0.0)
+
+    def set_position(self, x: float, y: float, z: float) -> Self:
+        """Moves all of the spheres so that their mean center is at the given position"""
+        self.centers = self.centers + (np.array([x, y, z]) - np.array(self.position))
+        return self
+
+    def update(self, world, delta):
+        # Build new arrays rather than changing them inplace, memory-mapped columns are read-only
+        if self._moving:
+            self.centers = self.centers + self.velocities * delta
+
+    def snapshot(self) -> Self:
+        # Columns are never modified inplace, so the copy can share them
+        return copy.copy(self)
+
+    def interpolate(self, other: Self, alpha: float) -> Self:
+        if self.centers is other.centers:
+            return self
+        ret = copy.copy(self)
+        ret.centers = self.centers + (other.centers - self.centers) * alpha
+        return ret
+
+    def distance(self, ray_start, ray_end):
+        """Same math as `Sphere.distance()`, done for all spheres at once, returning the closest hit"""
+        return float(self.distances(ray_start, np.asarray(ray_end)[None, :])[0])
+
+    def distances(self, ray_start, ray_ends, max_pairs: int = 2 ** 22):
+        """Closest hit out of all the spheres for each ray, working on chunks of rays to keep memory bounded"""
+        ray_ends = np.asarray(ray_ends)
+        ret = np.full((len(ray_ends),), -1.0)
+        if len(self) == 0:
+            return ret
+
+        chunk_size = max(1, max_pairs // len(self))
+        for i in range(0, len(ray_ends), chunk_size):
+            dists = ray_sphere_distances(ray_start, ray_ends[i:i + chunk_size], self.centers, self.radii)
+            dists = np.where(dists >= 0, dists, np.inf).min(axis=1)
+            ret[i:i + chunk_size] = np.where(np.isfinite(dists), dists, -1.0)
+        return ret
+
+    def projected_bounds(self, focal_length):
+        return sphere_projected_bounds(self.centers, self.radii, focal_length)
+
+    def primitive_distances(self, ray_start, ray_ends, primitive_ids):
+        return ray_sphere_distances(ray_start, ray_ends, self.centers[primitive_ids], self.radii[primitive_ids], pairwise=True)
\ No newline at end of file
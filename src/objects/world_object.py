@@ -1,3 +1,5 @@
+import copy
+import numpy as np
 from typing_extensions import Self
 
 
@@ -18,4 +20,47 @@ class WorldObject:
 
     def distance(self, ray_start, ray_end):
         """Computes the distance between a ray and this object, returning -1 if it never hits"""
+        raise NotImplementedError
+
+    def distances(self, ray_start, ray_ends):
+        """Computes distance() for many rays at once
+        
+        Args:
+            ray_start (array): (3,) start point shared by every ray
+            ray_ends (array): (N, 3) end point of each ray
+        
+        Returns:
+            np.ndarray: (N,) array of distances, with -1 for rays that never hit. Subclasses should override this with 
+                something faster than calling distance() once per ray
+        """
+        return np.array([self.distance(ray_start, ray_end) for ray_end in ray_ends], dtype='float64')
+
+    def snapshot(self) -> Self:
+        """Returns a copy of this object that will not change when this object is updated"""
+        return copy.deepcopy(self)
+
+    def interpolate(self, other: Self, alpha: float) -> Self:
+        """Returns a copy of this object `alpha` of the way (in [0, 1]) between this state and the later state `other`"""
+        ret = copy.copy(self)
+        ret.position = tuple(a + (b - a) * alpha for a, b in zip(self.position, other.position))
+        return ret
+
+    def projected_bounds(self, focal_length):
+        """Where this object shows up on the viewport of a `RayTracingCamera`, so it only has to be checked against rays
+        that could actually hit it
+        
+        Objects can be made of several primitives (eg: spheres in a `SphereCollection`), each with their own bounds.
+
+        Args:
+            focal_length (float): the focal length of the camera, whose viewport is the plane z=focal_length
+        
+        Returns:
+            Optional[tuple[np.ndarray, np.ndarray]]: None if this object can't be bounded (every ray must be checked 
+                with distances()). Otherwise a (M, 4) array of [x_min, x_max, y_min, y_max] on the viewport for each 
+                of the M primitives, and a (M,) array of the smallest distance each primitive could be hit at
+        """
+        return None
+
+    def primitive_distances(self, ray_start, ray_ends, primitive_ids):
+        """Like distances(), but ray i is only checked against primitive primitive_ids[i] (see projected_bounds())"""
         raise NotImplementedError
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""Renders the frames of an offline animation in parallel on a pool of local worker processes
+
+Example:
+
+    with RenderFarm('scene.bhs', RayTracingCamera(), screen_shape=(1600, 1000), n_workers=8) as farm:
+        for i, pixels in enumerate(farm.render([i / 30 for i in range(300)])):
+            np.save('frame_%04d.npy' % i, pixels)
+"""
+import os
+import copy
+import heapq
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+import numpy as np
+from timeit import default_timer
+from typing_extensions import Self
+from .utils import check_type
+from .world import World
+
+
+# Longest time to wait on results before checking if any workers have died or stalled
+_POLL_TIME = 1.0
+
+# Number of frames handed to each worker at a time, so a worker always has its next frame ready
+_JOBS_PER_WORKER = 2
+
+# How long stop() gives workers to exit by themselves before killing them
+_STOP_TIMEOUT = 5.0
+
+
+class RenderFarm:
+    """Hands out frames to a pool of worker processes and collects the rendered frames in order
+
+    Each worker loads the scene once when it starts and keeps it between jobs. A job is just a frame index and a
+    time: the worker steps its own copy of the world forward to that time at a fixed timestep (so every worker agrees
+    on the state of the world no matter which frames it gets), then draws it. Jobs are handed out lowest frame first,
+    so each worker usually only has to step forward from its last frame.
+
+    Every worker talks to the coordinator over its own pipe. If a worker dies (even halfway through sending a frame)
+    or stalls, only its pipe is affected: it is thrown away along with the worker, a new worker takes its place, and
+    the frames it had been handed are retried.
+
+    Parameters
+    ----------
+    scene: `Union[str, World]`
+        Either the path to a scene file (see `src.scene_file`), which every worker memory-maps, or a `World`, which is
+        sent to every worker once when it starts
+    camera: `RayTracingCamera`
+        The camera to draw each frame with
+    screen_shape: `tuple[int, int]`
+        Shape of the pixel array each frame is drawn to
+    n_workers: `Optional[int]`
+        Number of worker processes. Defaults to the number of cpus
+    dt: `float`
+        The fixed timestep used to step the world forward to the time of each frame
+    max_retries: `int`
+        Number of times a frame is retried after its job fails (or its worker dies or stalls) before giving up
+    stall_timeout: `Optional[float]`
+        If a worker that has been handed frames doesn't send anything back for this many seconds, it is killed and
+        its frames are retried. None to wait forever
+    verbose: `bool`
+        If True, print progress and throughput as frames finish
+    """
+    def __init__(self, scene, camera, screen_shape: tuple[int, int], n_workers: int = None, dt: float = 1 / 120,
+                 max_retries: int = 2, stall_timeout: float = 600.0, verbose: bool = True):
+        if not isinstance(scene, (str, World)):
+            raise TypeError("`scene` must be a path to a scene file or a World, got: %s" % repr(type(scene).__name__))
+
+        self.scene = scene
+        self.camera = camera
+        self.screen_shape = tuple(int(check_type(s, 'int-positive', varname='screen_shape')) for s in screen_shape)
+        n_workers = n_workers if n_workers is not None else (os.cpu_count() or 1)
+        self.n_workers = int(check_type(n_workers, 'int-positive', varname='n_workers'))
+        self.dt = check_type(dt, 'float-positive', varname='dt')
+        self.max_retries = int(check_type(max_retries, 'int-non-negative', varname='max_retries'))
+        if stall_timeout is not None:
+            stall_timeout = check_type(stall_timeout, 'float-positive', varname='stall_timeout')
+        self.stall_timeout = stall_timeout
+        self.verbose = verbose
+
+        # Spawn (rather than fork) so workers don't inherit any running threads, eg: from a SimulationRunner
+        self._ctx = multiprocessing.get_context('spawn')
+        self._workers = {}  # worker id -> (process, connection to the worker)
+        self._next_worker_id = 0
+
+        # Incremented on every call to render(), so results left over from an earlier call that was stopped early
+        #   can be told apart and ignored
+        self._generation = 0
+
+    def start(self) -> Self:
+        """Starts all of the worker processes"""
+        if len(self._workers) > 0:
+            raise RuntimeError("Render farm is already running")
+
+        for _ in range(self.n_workers):
+            self._start_worker()
+        return self
+
+    def stop(self, timeout: float = _STOP_TIMEOUT):
+        """Tells all of the workers to exit, killing any that haven't exited after `timeout` seconds
+
+        Workers only see the exit message once they finish the frames they have already been handed, so a busy (or
+        hung) worker is killed rather than waited on.
+        """
+        for _, conn in self._workers.values():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+
+        # Workers blocked sending a frame can't see the exit message until that frame has been read
+        deadline = default_timer() + timeout
+        for process, conn in self._workers.values():
+            while process.is_alive() and default_timer() < deadline:
+                _drain(conn)
+                process.join(timeout=0.1)
+            if process.is_alive():
+                process.kill()
+            process.join()
+            conn.close()
+        self._workers = {}
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def render(self, times):
+        """Renders one frame at each of the given world times, yielding each frame's pixels in order
+
+        Args:
+            times (Iterable[float]): the time in the world to render each frame at
+
+        Yields:
+            np.ndarray: the pixels of each frame, with shape `screen_shape`
+        """
+        if len(self._workers) == 0:
+            raise RuntimeError("Render farm must be started before rendering, use start() or a `with` block")
+
+        self._generation += 1
+        times = [check_type(t, 'float', varname='times') for t in times]
+
+        pending = list(range(len(times)))  # heap of frames that still need to be handed out
+        assigned = {worker_id: [] for worker_id in self._workers}  # frames each worker has been handed, in order
+        last_heard = {}  # worker id -> when it last sent something (or was handed a frame while idle)
+        failures = [0] * len(times)
+        finished = {}
+        next_index, n_done = 0, 0
+        start_time = default_timer()
+
+        while next_index < len(times):
+            self._dispatch(pending, assigned, last_heard, failures, times)
+
+            conn_ids = {conn: worker_id for worker_id, (_, conn) in self._workers.items()}
+            for conn in wait(list(conn_ids), timeout=_POLL_TIME):
+                worker_id = conn_ids[conn]
+                try:
+                    kind, generation, index, value = conn.recv()
+                except Exception:
+                    # The worker exited or died partway through sending, either way it's done for
+                    self._replace_worker(worker_id, pending, assigned, failures, "Lost connection to worker")
+                    continue
+
+                last_heard[worker_id] = default_timer()
+                if generation != self._generation or index not in assigned[worker_id]:
+                    continue
+                assigned[worker_id].remove(index)
+
+                if kind == 'error':
+                    self._retry(index, pending, failures, "Frame %d failed with:\n%s" % (index, value))
+                    continue
+
+                finished[index] = value
+                n_done += 1
+                if self.verbose:
+                    elapsed = default_timer() - start_time
+                    print("Rendered frame %d/%d (%.2f frames/s)" % (n_done, len(times), n_done / elapsed))
+
+            # Check on the workers every time around, so a dead worker's frames don't hold up everything after them
+            self._replace_dead_workers(pending, assigned, last_heard, failures)
+
+            # Yield all of the frames that are now ready, in order
+            while next_index in finished:
+                yield finished.pop(next_index)
+                next_index += 1
+
+        if self.verbose:
+            elapsed = default_timer() - start_time
+            print("Rendered %d frames in %.2fs (%.2f frames/s, %d retries)"
+                  % (len(times), elapsed, len(times) / max(elapsed, 1e-9), sum(failures)))
+
+    def _dispatch(self, pending, assigned, last_heard, failures, times):
+        """Hands out the lowest pending frames to any workers that have room for more"""
+        for worker_id, (_, conn) in list(self._workers.items()):
+            if len(assigned[worker_id]) == 0:
+                last_heard[worker_id] = default_timer()
+
+            while len(pending) > 0 and len(assigned[worker_id]) < _JOBS_PER_WORKER:
+                index = heapq.heappop(pending)
+                assigned[worker_id].append(index)
+                try:
+                    conn.send((self._generation, index, times[index]))
+                except OSError:
+                    # This frame never made it to the worker, so it doesn't count against the frame
+                    assigned[worker_id].remove(index)
+                    heapq.heappush(pending, index)
+                    self._replace_worker(worker_id, pending, assigned, failures, "Lost connection to worker")
+                    break
+
+    def _retry(self, index, pending, failures, reason, failed: bool = True):
+        """Puts a frame back to be handed out again. If it `failed`, raises an error once it has failed too many times"""
+        failures[index] += failed
+        if failures[index] > self.max_retries:
+            raise RuntimeError("Giving up on frame %d after %d attempts. %s" % (index, failures[index], reason))
+        heapq.heappush(pending, index)
+
+    def _replace_dead_workers(self, pending, assigned, last_heard, failures):
+        """Replaces any workers that have died or stalled, retrying the frames they had been handed"""
+        now = default_timer()
+        for worker_id, (process, _) in list(self._workers.items()):
+            if not process.is_alive():
+                self._replace_worker(worker_id, pending, assigned, failures,
+                                     "Worker died with exit code %s" % process.exitcode)
+            elif self.stall_timeout is not None and len(assigned[worker_id]) > 0 and \
+                    now - last_heard.get(worker_id, now) > self.stall_timeout:
+                self._replace_worker(worker_id, pending, assigned, failures,
+                                     "Worker stalled for more than %.1fs" % self.stall_timeout)
+
+    def _replace_worker(self, worker_id, pending, assigned, failures, reason):
+        """Kills a worker and throws away its connection, starting a new worker and retrying the frames it had
+
+        Workers render their frames in the order they were handed out, so only the first one is blamed. The frames
+        queued up behind it never ran, and are put back without counting as a failure.
+        """
+        if worker_id not in self._workers:
+            return
+
+        process, conn = self._workers.pop(worker_id)
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+
+        assigned[self._start_worker()] = []
+        for i, index in enumerate(assigned.pop(worker_id)):
+            self._retry(index, pending, failures, reason, failed=(i == 0))
+
+    def _start_worker(self) -> int:
+        """Starts a new worker process, returning its id"""
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+
+        conn, worker_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, name='RenderFarmWorker-%d' % worker_id, daemon=True,
+                                    args=(self.scene, self.camera, self.screen_shape, self.dt, worker_conn))
+        process.start()
+
+        # Only the worker should hold its end, so we see EOF as soon as the worker goes away
+        worker_conn.close()
+        self._workers[worker_id] = (process, conn)
+        return worker_id
+
+
+def _drain(conn):
+    """Reads (and throws away) everything currently waiting on the given connection"""
+    try:
+        while conn.poll():
+            conn.recv()
+    except (EOFError, OSError):
+        pass
+
+
+def _load_world(scene) -> World:
+    """Gets a fresh copy of the scene's starting world"""
+    return World.load(scene) if isinstance(scene, str) else copy.deepcopy(scene)
+
+
+def _worker_main(scene, camera, screen_shape, dt, conn):
+    """Main loop of each worker process"""
+    world = _load_world(scene)
+    start_time, steps = world.time, 0
+    pixels = np.zeros(screen_shape, dtype='uint32')
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        generation, index, t = job
+
+        try:
+            # Count whole steps from the start instead of adding up times, so every worker steps the same way. If
+            #   this frame is earlier than our world (eg: a retried frame), start over from the beginning
+            target_steps = max(0, int(round((t - start_time) / dt)))
+            if target_steps < steps:
+                world, steps = _load_world(scene), 0
+
+            while steps < target_steps:
+                world.update(dt)
+                steps += 1
+
+            camera.draw(pixels, world)
+            result = ('done', generation, index, pixels.copy())
+        except Exception:
+            result = ('error', generation, index, traceback.format_exc())
+
+        try:
+            conn.send(result)
+        except OSError:
+            return
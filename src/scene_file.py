@@ -0,0 +1,164 @@
+"""Saving/loading worlds to/from a compact binary scene file
+
+File layout (all values little-endian):
+
+    Header (64 bytes):
+        magic       8 bytes     b'BHSCENE\\0'
+        version     uint32      currently 1
+        n_columns   uint32      number of entries in the column table
+        n_objects   uint64      number of rows in every column
+        time        float64     time in the world when it was saved
+        (zero padding up to 64 bytes)
+
+    Column table (64 bytes per column):
+        name        32 bytes    ascii column name, null padded
+        dtype       8 bytes     numpy dtype string, eg: '<f8'
+        width       uint32      number of values per object (eg: 3 for centers)
+        (4 bytes padding)
+        offset      uint64      byte offset of the column data from the start of the file
+        nbytes      uint64      size of the column data in bytes
+
+    Column data, each column starting on a 64-byte boundary
+
+Version 1 has the columns 'centers', 'radii', 'velocities', and 'material_ids', which are loaded into a single
+`SphereCollection`. Columns are memory-mapped on load, so nothing is parsed per object and many processes can share
+the same scene file.
+"""
+import os
+import struct
+import numpy as np
+from .objects import Sphere, SphereCollection
+from .world import World
+
+
+SCENE_MAGIC = b'BHSCENE\0'
+SCENE_VERSION = 1
+
+_ALIGNMENT = 64
+_HEADER = struct.Struct('<8sIIQd')
+_COLUMN = struct.Struct('<32s8sIxxxxQQ')
+
+# name, dtype, width (None means a 1-d column)
+_SPHERE_COLUMNS = [
+    ('centers', '<f8', 3),
+    ('radii', '<f8', None),
+    ('velocities', '<f8', 3),
+    ('material_ids', '<i4', None),
+]
+
+
+def _align(n: int) -> int:
+    """Rounds n up to the next multiple of _ALIGNMENT"""
+    return (n + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _sphere_columns(world: World) -> dict:
+    """Gathers all of the spheres in the world into one array per column"""
+    spheres, collections = [], []
+    for obj in world.objects:
+        if isinstance(obj, SphereCollection):
+            collections.append(obj)
+        elif isinstance(obj, Sphere):
+            spheres.append(obj)
+        else:
+            raise TypeError("Cannot save objects of type %s to a scene file" % repr(type(obj).__name__))
+
+    parts = {name: [getattr(c, name) for c in collections] for name, _, _ in _SPHERE_COLUMNS}
+    if len(spheres) > 0:
+        parts['centers'].append(np.array([s.position for s in spheres], dtype='float64'))
+        parts['radii'].append(np.array([s.radius for s in spheres], dtype='float64'))
+        parts['velocities'].append(np.array([s.velocity for s in spheres], dtype='float64'))
+        parts['material_ids'].append(np.array([s.material_id for s in spheres], dtype='int32'))
+
+    columns = {}
+    for name, dtype, width in _SPHERE_COLUMNS:
+        empty = np.empty((0,) if width is None else (0, width), dtype=dtype)
+        columns[name] = np.ascontiguousarray(np.concatenate(parts[name]) if len(parts[name]) > 0 else empty, dtype=dtype)
+    return columns
+
+
+def save_scene(path: str, world: World):
+    """Saves all of the objects in the given world to a scene file
+
+    Args:
+        path (str): the file to write to
+        world (World): the world to save. Can currently only contain `Sphere` and `SphereCollection` objects
+    """
+    columns = _sphere_columns(world)
+    n_objects = len(columns['radii'])
+
+    # Figure out where each column goes in the file
+    offset = _align(_ALIGNMENT + _COLUMN.size * len(columns))
+    table = []
+    for name, dtype, width in _SPHERE_COLUMNS:
+        table.append((name, dtype, 1 if width is None else width, offset, columns[name].nbytes))
+        offset = _align(offset + columns[name].nbytes)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(SCENE_MAGIC, SCENE_VERSION, len(table), n_objects, float(world.time)).ljust(_ALIGNMENT, b'\0'))
+        for name, dtype, width, col_offset, nbytes in table:
+            f.write(_COLUMN.pack(name.encode('ascii'), dtype.encode('ascii'), width, col_offset, nbytes))
+
+        for (name, _, _, col_offset, _) in table:
+            f.write(b'\0' * (col_offset - f.tell()))
+            f.write(columns[name].tobytes())
+
+
+def load_scene(path: str, mmap: bool = True, validate: bool = True) -> World:
+    """Loads a world from the given scene file
+
+    Args:
+        path (str): the file to read from
+        mmap (bool): if True, the columns are memory-mapped (read-only) instead of being read into memory
+        validate (bool): if True, check the values of every column (vectorized) after loading
+
+    Returns:
+        World: a new world containing a single `SphereCollection` with all of the spheres in the file
+    """
+    with open(path, 'rb') as f:
+        header = f.read(_ALIGNMENT)
+        if len(header) < _HEADER.size or header[:len(SCENE_MAGIC)] != SCENE_MAGIC:
+            raise ValueError("Not a scene file: %s" % repr(path))
+
+        _, version, n_columns, n_objects, time = _HEADER.unpack_from(header)
+        if version > SCENE_VERSION:
+            raise ValueError("Scene file %s has version %d, but only versions up to %d are supported"
+                             % (repr(path), version, SCENE_VERSION))
+
+        file_size = os.fstat(f.fileno()).st_size
+        raw_table = f.read(_COLUMN.size * n_columns)
+        if len(raw_table) < _COLUMN.size * n_columns:
+            raise ValueError("Scene file %s is truncated, its column table is incomplete" % repr(path))
+
+        table = {}
+        for name, dtype, width, offset, nbytes in _COLUMN.iter_unpack(raw_table):
+            try:
+                name, dtype = name.rstrip(b'\0').decode('ascii'), np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+            except (UnicodeDecodeError, TypeError):
+                raise ValueError("Scene file %s has a corrupt column table" % repr(path))
+            table[name] = (dtype, width, offset, nbytes)
+
+    columns = {}
+    for name, _, width in _SPHERE_COLUMNS:
+        if name not in table:
+            raise ValueError("Scene file %s is missing column %s" % (repr(path), repr(name)))
+
+        dtype, file_width, offset, nbytes = table[name]
+        shape = (n_objects,) if width is None else (n_objects, width)
+        if file_width != (1 if width is None else width) or nbytes != n_objects * file_width * dtype.itemsize:
+            raise ValueError("Column %s in scene file %s has the wrong size" % (repr(name), repr(path)))
+        if offset + nbytes > file_size:
+            raise ValueError("Column %s in scene file %s runs past the end of the file" % (repr(name), repr(path)))
+
+        if n_objects == 0:
+            columns[name] = np.empty(shape, dtype=dtype)
+        elif mmap:
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            columns[name] = np.fromfile(path, dtype=dtype, count=n_objects * file_width, offset=offset).reshape(shape)
+
+    world = World()
+    world.time = time
+    if n_objects > 0:
+        world.add_object(SphereCollection(**columns, validate=validate))
+    return world
\ No newline at end of file
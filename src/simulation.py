@@ -0,0 +1,130 @@
+"""Runs the simulation of a world on its own thread, separate from rendering"""
+import threading
+from timeit import default_timer
+from typing_extensions import Self
+from .utils import check_type
+from .world import World, WorldSnapshot
+
+
+class SimulationRunner:
+    """Steps a world forward at a fixed timestep on a background thread
+
+    Every step publishes a new `WorldSnapshot`. The two most recent snapshots are kept (double-buffered) so that
+    cameras can render from `get_state()` at any time without waiting on, or being changed by, the simulation. Since
+    the world only ever moves forward by exactly `dt`, the physics is the same no matter how fast we render.
+
+    Parameters
+    ----------
+    world: `World`
+        The world to simulate. It should not be touched by anything else while the runner is running
+    dt: `float`
+        The fixed amount of world time (in seconds) that passes on each step
+    max_catch_up_steps: `int`
+        The maximum number of steps to take at once when the simulation has fallen behind real time. Any time past
+        that is dropped, so one slow step can't snowball into the simulation never catching up
+    interpolate: `bool`
+        If True, get_state() will interpolate between the two most recent snapshots based on how much time has
+        passed since the latest one, giving smoother motion when rendering faster than `dt`
+    """
+    def __init__(self, world: World, dt: float = 1 / 120, max_catch_up_steps: int = 5, interpolate: bool = True):
+        if not isinstance(world, World):
+            raise TypeError("Can only simulate objects of type 'World', not %s" % repr(type(world).__name__))
+
+        self.world = world
+        self.dt = check_type(dt, 'float-positive', varname='dt')
+        self.max_catch_up_steps = int(check_type(max_catch_up_steps, 'int-positive', varname='max_catch_up_steps'))
+        self.interpolate = interpolate
+
+        self.steps_taken = 0
+        """The total number of steps the world has been updated by"""
+
+        self.dropped_time = 0.0
+        """Total real time (in seconds) skipped because the simulation couldn't keep up"""
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+
+        # (previous snapshot, current snapshot, real time the current snapshot was published)
+        snapshot = self.world.snapshot()
+        self._published = (snapshot, snapshot, default_timer())
+
+    def step(self):
+        """Updates the world by a single `dt` and publishes the new state"""
+        self.world.update(self.dt)
+        self.steps_taken += 1
+        snapshot = self.world.snapshot()
+
+        with self._lock:
+            self._published = (self._published[1], snapshot, default_timer())
+
+    def get_state(self) -> WorldSnapshot:
+        """Returns the most recent state of the world to render from"""
+        if self._error is not None:
+            raise RuntimeError("Simulation thread stopped due to an error") from self._error
+
+        with self._lock:
+            previous, current, published_time = self._published
+
+        if not self.interpolate or previous is current:
+            return current
+
+        # Render one step behind, moving from the previous state towards the current state over the course of one dt
+        alpha = min(1.0, (default_timer() - published_time) / self.dt)
+        return previous.interpolate(current, alpha)
+
+    def start(self) -> Self:
+        """Starts simulating on a background thread"""
+        if self.running:
+            raise RuntimeError("Simulation is already running")
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='SimulationRunner', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background thread, waiting for the current step to finish"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        """True if the background thread is currently running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _run(self):
+        """Main loop of the background thread"""
+        accumulator = 0.0
+        last_time = default_timer()
+
+        try:
+            while not self._stop_event.is_set():
+                curr_time = default_timer()
+                accumulator += curr_time - last_time
+                last_time = curr_time
+
+                # Take as many fixed steps as we need to catch up to real time, up to our limit
+                steps = 0
+                while accumulator >= self.dt and steps < self.max_catch_up_steps:
+                    self.step()
+                    accumulator -= self.dt
+                    steps += 1
+
+                if accumulator >= self.dt:
+                    self.dropped_time += accumulator
+                    accumulator = 0.0
+
+                # Sleep until the next step is due. Waiting on the event lets stop() wake us up early
+                self._stop_event.wait(max(0.0, self.dt - accumulator))
+        except Exception as e:
+            self._error = e
\ No newline at end of file
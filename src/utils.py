@@ -49,7 +49,7 @@ def check_type(val, type_str: str, varname: str):
         - 'int'
         - '[float|int]-[positive|negative|non-negative]'
     """
-    type_str = type_str.lower().replace(' ', '').replace('_', '').replace('-', '').replace('integer', 'int')
+    type_str = type_str.lower().replace(' ', '').replace('_', '-').replace('integer', 'int')
 
     if type_str.startswith('float'):
         if not isinstance(val, (int, float, np.integer, np.floating)):
@@ -57,9 +57,9 @@ def check_type(val, type_str: str, varname: str):
         
         if '-positive' in type_str and val <= 0:
             raise ValueError("`%s` must be positive, got: %s" % (varname, val))
-        if '-non-negative' in type_str and val < 0:
+        elif '-non-negative' in type_str and val < 0:
             raise ValueError("`%s` must be non-negative, got: %s" % (varname, val))
-        if '-negative' in type_str and val >= 0:
+        elif '-negative' in type_str and '-non-negative' not in type_str and val >= 0:
             raise ValueError("`%s` must be negative, got: %s" % (varname, val))
         
         return float(val)
@@ -70,9 +70,9 @@ def check_type(val, type_str: str, varname: str):
         
         if '-positive' in type_str and val <= 0:
             raise ValueError("`%s` must be positive, got: %s" % (varname, val))
-        if '-non-negative' in type_str and val < 0:
+        elif '-non-negative' in type_str and val < 0:
             raise ValueError("`%s` must be non-negative, got: %s" % (varname, val))
-        if '-negative' in type_str and val >= 0:
+        elif '-negative' in type_str and '-non-negative' not in type_str and val >= 0:
             raise ValueError("`%s` must be negative, got: %s" % (varname, val))
         
         return float(val)
@@ -87,4 +87,52 @@ def check_type(val, type_str: str, varname: str):
         return tuple(check_type(v, type_str='float', varname=varname+'-elem_%d' % i) for i, v in enumerate(val))
     
     else:
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+
+def check_array_type(arr, type_str: str, varname: str, width: int = None):
+    """Vectorized version of check_type(), checks every element of the given array at once
+    
+    Available types:
+        - 'float'
+        - 'int'
+        - '[float|int]-[positive|negative|non-negative]'
+    
+    Args:
+        arr (ArrayLike): the values to check
+        type_str (str): the type every value should be
+        varname (str): name of the variable, used in error messages
+        width (Optional[int]): if passed, `arr` should have shape (N, width), otherwise it should have shape (N,)
+    
+    Returns:
+        np.ndarray: `arr` as a numpy array. This is the same array (not a copy) if it already had a good dtype
+    """
+    type_str = type_str.lower().replace(' ', '').replace('_', '-').replace('integer', 'int')
+    arr = np.asarray(arr)
+
+    expected_ndim = 1 if width is None else 2
+    if arr.ndim != expected_ndim or (width is not None and arr.shape[1] != width):
+        raise ValueError("`%s` must have shape %s, got: %s" % (varname, '(N,)' if width is None else '(N, %d)' % width, arr.shape))
+
+    if type_str.startswith('float'):
+        if arr.dtype.kind not in 'iuf':
+            raise ValueError("`%s` must be an array of floats, got dtype: %s" % (varname, arr.dtype))
+        if arr.dtype.kind == 'f' and not np.isfinite(arr).all():
+            raise ValueError("`%s` must only contain finite values" % varname)
+    elif type_str.startswith('int'):
+        if arr.dtype.kind not in 'iu':
+            raise ValueError("`%s` must be an array of ints, got dtype: %s" % (varname, arr.dtype))
+    else:
+        raise NotImplementedError
+    
+    if type_str.endswith('-non-negative'):
+        if arr.size > 0 and arr.min() < 0:
+            raise ValueError("`%s` must be non-negative, got value: %s" % (varname, arr.min()))
+    elif type_str.endswith('-positive'):
+        if arr.size > 0 and arr.min() <= 0:
+            raise ValueError("`%s` must be positive, got value: %s" % (varname, arr.min()))
+    elif type_str.endswith('-negative'):
+        if arr.size > 0 and arr.max() >= 0:
+            raise ValueError("`%s` must be negative, got value: %s" % (varname, arr.max()))
+    
+    return arr
\ No newline at end of file
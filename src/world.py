@@ -1,7 +1,30 @@
 """Holds objects/cameras and simulates reality"""
 from .objects import WorldObject
+from typing import NamedTuple
 from typing_extensions import Self
 
+
+class WorldSnapshot(NamedTuple):
+    """An immutable copy of the state of a world at some point in time
+
+    Cameras can draw from a snapshot exactly like they would from a `World`, while the world itself keeps updating
+    on another thread.
+    """
+
+    time: float
+    """The time in the world when this snapshot was taken"""
+
+    objects: tuple[WorldObject, ...]
+    """Copies of the objects in the world at that time"""
+
+    def interpolate(self, other: 'WorldSnapshot', alpha: float) -> 'WorldSnapshot':
+        """Returns a new snapshot `alpha` of the way (in [0, 1]) between this snapshot and the later snapshot `other`"""
+        if len(self.objects) != len(other.objects):
+            return other
+        return WorldSnapshot(time=self.time + (other.time - self.time) * alpha,
+                             objects=tuple(a.interpolate(b, alpha) for a, b in zip(self.objects, other.objects)))
+
+
 class World:
     """Holds objects/cameras and simulates reality
     
@@ -16,7 +39,8 @@ class World:
     """The current time in the world"""
     
     def __init__(self):
-        pass
+        self.objects = []
+        self.time = 0.0
 
     def add_object(self, wo: WorldObject) -> Self:
         """Adds the given object to the world"""
@@ -36,4 +60,18 @@ class World:
         for wo in self.objects:
             wo.update(self, delta)
         self.time += delta
-        
\ No newline at end of file
+    
+    def snapshot(self) -> WorldSnapshot:
+        """Returns an immutable copy of the current state of the world"""
+        return WorldSnapshot(time=self.time, objects=tuple(wo.snapshot() for wo in self.objects))
+    
+    def save(self, path: str):
+        """Saves this world to a binary scene file, see `src.scene_file`"""
+        from .scene_file import save_scene
+        save_scene(path, self)
+    
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, validate: bool = True) -> 'World':
+        """Loads a world from a binary scene file, memory-mapping its columns by default. See `src.scene_file`"""
+        from .scene_file import load_scene
+        return load_scene(path, mmap=mmap, validate=validate)
\ No newline at end of file
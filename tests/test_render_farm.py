@@ -0,0 +1,167 @@
+import os
+import time
+import signal
+import numpy as np
+import pytest
+from src.world import World
+from src.objects import Sphere
+from src.camera import RayTracingCamera
+from src.render_farm import RenderFarm
+
+
+SCREEN_SHAPE = (30, 40)
+
+# Frames bigger than a pipe's buffer, so sending one takes several writes that a crash could cut off
+BIG_SCREEN_SHAPE = (500, 500)
+DT = 1 / 60
+
+
+def _claim(marker):
+    """Returns True for only the first process that calls this with the given marker file"""
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+        return True
+    except FileExistsError:
+        return False
+
+
+class CrashAfterResultCamera(RayTracingCamera):
+    """Kills its worker on the frame after it has sent back a result, but only in the first worker to get there"""
+    def __init__(self, marker):
+        super().__init__(focal_length=1, viewport_width=2)
+        self.marker = marker
+        self.n_draws = 0
+
+    def draw(self, screen, world):
+        self.n_draws += 1
+        if self.n_draws == 2 and _claim(self.marker):
+            os._exit(3)
+        super().draw(screen, world)
+
+
+class HangOnceCamera(RayTracingCamera):
+    """Hangs forever on one frame, in the first worker to draw"""
+    def __init__(self, marker):
+        super().__init__(focal_length=1, viewport_width=2)
+        self.marker = marker
+
+    def draw(self, screen, world):
+        if _claim(self.marker):
+            time.sleep(3600)
+        super().draw(screen, world)
+
+
+class SlowCamera(RayTracingCamera):
+    def draw(self, screen, world):
+        time.sleep(0.2)
+        super().draw(screen, world)
+
+
+class FailFirstFrameCamera(RayTracingCamera):
+    """Fails on the frame at the start of the world, and hangs forever on every other frame"""
+    def draw(self, screen, world):
+        if world.time == 0:
+            raise ValueError("Can't draw")
+        time.sleep(3600)
+
+
+class AlwaysFailCamera(RayTracingCamera):
+    def draw(self, screen, world):
+        raise ValueError("Can't draw")
+
+
+def _make_world():
+    return World().add_objects(Sphere((0, 0, 4), radius=1, velocity=(1, 0, 0)))
+
+
+def _serial_frames(times, screen_shape=SCREEN_SHAPE):
+    """Renders the frames one by one, stepping the world the same way the workers do"""
+    frames = []
+    for t in times:
+        world = _make_world()
+        for _ in range(int(round(t / DT))):
+            world.update(DT)
+        pixels = np.zeros(screen_shape, dtype='uint32')
+        RayTracingCamera(focal_length=1, viewport_width=2).draw(pixels, world)
+        frames.append(pixels)
+    return frames
+
+
+def test_render_in_order():
+    times = [i / 10 for i in range(8)]
+    with RenderFarm(_make_world(), RayTracingCamera(focal_length=1, viewport_width=2), SCREEN_SHAPE, n_workers=2,
+                    dt=DT, verbose=False) as farm:
+        frames = list(farm.render(times))
+
+    assert all(np.array_equal(a, b) for a, b in zip(frames, _serial_frames(times)))
+    assert len(frames) == len(times)
+
+
+def test_worker_killed_after_sending_result(tmp_path):
+    times = [i / 10 for i in range(8)]
+    camera = CrashAfterResultCamera(str(tmp_path / 'crashed'))
+    with RenderFarm(_make_world(), camera, BIG_SCREEN_SHAPE, n_workers=2, dt=DT, stall_timeout=30, verbose=False) as farm:
+        frames = list(farm.render(times))
+
+    assert os.path.exists(tmp_path / 'crashed')
+    assert all(np.array_equal(a, b) for a, b in zip(frames, _serial_frames(times, BIG_SCREEN_SHAPE)))
+    assert len(frames) == len(times)
+
+
+def test_worker_killed_mid_render():
+    times = [i / 10 for i in range(8)]
+    with RenderFarm(_make_world(), SlowCamera(focal_length=1, viewport_width=2), SCREEN_SHAPE, n_workers=2, dt=DT,
+                    stall_timeout=30, verbose=False) as farm:
+        frames = []
+        for pixels in farm.render(times):
+            if len(frames) == 0:
+                process, _ = next(iter(farm._workers.values()))
+                os.kill(process.pid, signal.SIGKILL)
+            frames.append(pixels)
+
+    assert all(np.array_equal(a, b) for a, b in zip(frames, _serial_frames(times)))
+    assert len(frames) == len(times)
+
+
+def test_stalled_worker_is_replaced(tmp_path):
+    times = [i / 10 for i in range(4)]
+    camera = HangOnceCamera(str(tmp_path / 'hung'))
+    with RenderFarm(_make_world(), camera, SCREEN_SHAPE, n_workers=2, dt=DT, stall_timeout=2, verbose=False) as farm:
+        frames = list(farm.render(times))
+
+    assert all(np.array_equal(a, b) for a, b in zip(frames, _serial_frames(times)))
+    assert len(frames) == len(times)
+
+
+def test_gives_up_after_max_retries():
+    with RenderFarm(_make_world(), AlwaysFailCamera(), SCREEN_SHAPE, n_workers=2, max_retries=1, verbose=False) as farm:
+        with pytest.raises(RuntimeError, match="Giving up on frame"):
+            list(farm.render([0.0, 0.1]))
+
+
+def test_hung_worker_does_not_block_exit():
+    farm = RenderFarm(_make_world(), FailFirstFrameCamera(focal_length=1, viewport_width=2), SCREEN_SHAPE,
+                      n_workers=2, max_retries=0, stall_timeout=None, verbose=False)
+    with pytest.raises(RuntimeError, match="Giving up on frame 0"):
+        with farm:
+            processes = [process for process, _ in farm._workers.values()]
+            try:
+                list(farm.render([i / 10 for i in range(4)]))
+            finally:
+                exit_time = time.time()
+
+    assert time.time() - exit_time < 30
+    assert not any(process.is_alive() for process in processes)
+    assert len(farm._workers) == 0
+
+
+def test_only_running_frame_is_blamed_for_dead_worker():
+    with RenderFarm(_make_world(), RayTracingCamera(focal_length=1, viewport_width=2), SCREEN_SHAPE, n_workers=1,
+                    max_retries=1, verbose=False) as farm:
+        worker_id = next(iter(farm._workers))
+        pending, assigned, failures = [], {worker_id: [5, 3]}, [0] * 6
+        farm._replace_worker(worker_id, pending, assigned, failures, "Worker died")
+
+        assert failures == [0, 0, 0, 0, 0, 1]
+        assert sorted(pending) == [3, 5]
+        assert len(farm._workers) == 1 and worker_id not in farm._workers
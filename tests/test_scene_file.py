@@ -0,0 +1,102 @@
+import struct
+import numpy as np
+import pytest
+from src.world import World
+from src.objects import Sphere, SphereCollection
+from src.scene_file import save_scene, load_scene, SCENE_VERSION
+from src.utils import check_array_type
+
+
+def _make_world():
+    collection = SphereCollection(centers=[[0, 0, 4], [1, 2, 3]], radii=[1, 0.5], velocities=[[1, 0, 0], [0, 0, -1]],
+                                  material_ids=[2, 3])
+    world = World().add_objects(collection, Sphere((5, 6, 7), radius=2, velocity=(0, 1, 0), material_id=1))
+    world.time = 12.5
+    return world
+
+
+def _check_loaded(world):
+    assert world.time == 12.5
+    assert len(world.objects) == 1
+    spheres = world.objects[0]
+    assert isinstance(spheres, SphereCollection)
+    assert np.array_equal(spheres.centers, [[0, 0, 4], [1, 2, 3], [5, 6, 7]])
+    assert np.array_equal(spheres.radii, [1, 0.5, 2])
+    assert np.array_equal(spheres.velocities, [[1, 0, 0], [0, 0, -1], [0, 1, 0]])
+    assert np.array_equal(spheres.material_ids, [2, 3, 1])
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_round_trip(tmp_path, mmap):
+    path = str(tmp_path / 'scene.bhs')
+    save_scene(path, _make_world())
+    _check_loaded(load_scene(path, mmap=mmap))
+
+
+def test_empty_world(tmp_path):
+    path = str(tmp_path / 'scene.bhs')
+    save_scene(path, World())
+    world = load_scene(path)
+    assert world.time == 0
+    assert len(world.objects) == 0
+
+
+def test_bad_magic(tmp_path):
+    path = tmp_path / 'scene.bhs'
+    path.write_bytes(b'NOTSCENE' + b'\0' * 56)
+    with pytest.raises(ValueError, match="Not a scene file"):
+        load_scene(str(path))
+
+
+def test_newer_version(tmp_path):
+    path = tmp_path / 'scene.bhs'
+    save_scene(str(path), _make_world())
+    data = bytearray(path.read_bytes())
+    data[8:12] = struct.pack('<I', SCENE_VERSION + 1)
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="only versions up to"):
+        load_scene(str(path))
+
+
+def test_truncated_column_table(tmp_path):
+    path = tmp_path / 'scene.bhs'
+    save_scene(str(path), _make_world())
+    path.write_bytes(path.read_bytes()[:100])
+    with pytest.raises(ValueError, match="column table is incomplete"):
+        load_scene(str(path))
+
+
+def test_truncated_column_data(tmp_path):
+    path = tmp_path / 'scene.bhs'
+    save_scene(str(path), _make_world())
+    path.write_bytes(path.read_bytes()[:-8])
+    with pytest.raises(ValueError, match="runs past the end of the file"):
+        load_scene(str(path))
+
+
+def test_wrong_column_size(tmp_path):
+    path = tmp_path / 'scene.bhs'
+    save_scene(str(path), _make_world())
+    data = bytearray(path.read_bytes())
+    data[64 + 40:64 + 44] = struct.pack('<I', 2)  # width of the 'centers' column
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="has the wrong size"):
+        load_scene(str(path))
+
+
+def test_check_array_type():
+    assert check_array_type([1.0, 2.0], 'float-positive', 'x').dtype == np.float64
+    with pytest.raises(ValueError, match="finite"):
+        check_array_type([1.0, np.nan], 'float', 'x')
+    with pytest.raises(ValueError, match="shape"):
+        check_array_type([[1.0, 2.0]], 'float', 'x', width=3)
+    with pytest.raises(ValueError, match="shape"):
+        check_array_type([[1.0, 2.0, 3.0]], 'float', 'x')
+    with pytest.raises(ValueError, match="must be positive"):
+        check_array_type([1.0, 0.0], 'float-positive', 'x')
+    with pytest.raises(ValueError, match="must be non-negative"):
+        check_array_type([0, -1], 'int-non-negative', 'x')
+    with pytest.raises(ValueError, match="must be negative"):
+        check_array_type([-1, 0], 'int-negative', 'x')
+    with pytest.raises(ValueError, match="ints"):
+        check_array_type([1.5], 'int', 'x')